@@ -5,6 +5,7 @@
 Module providing some constants.
 """
 
+import sys
 import torch
 
 # standardize is checked, then normalize_population, then normalize_bounds.
@@ -60,6 +61,37 @@ default_batch_size = 64
 # (From Braysen's example.py.)
 device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
+# Input shapes are fixed (apart from a smaller final batch), so let cuDNN pick
+# the fastest algorithms for them.
+torch.backends.cudnn.benchmark = True
+
+# Whether to compile the models' layers with torch.compile when training, if
+# this version of pytorch supports it.
+compile_models = True
+
+# Whether compilation is actually used on this device.  (Only on CUDA, and not
+# on Windows, where torch.compile's default backend is generally unavailable: on
+# CPU it needs a working C++ toolchain, and a failure would only surface on the
+# first forward pass.)
+use_compile_models = compile_models and device.type == 'cuda' and sys.platform != 'win32'
+
+# Whether to run forward passes with bfloat16 mixed precision (autocast) on
+# CUDA devices that support it.  (bfloat16 has float32's range, so no gradient
+# scaling is needed.)
+mixed_precision = True
+
+# Whether mixed precision is actually used on this device.
+use_mixed_precision = mixed_precision and device.type == 'cuda' and torch.cuda.is_bf16_supported()
+
+def autocast():
+	"""
+	Get a context manager that runs forward passes with bfloat16 mixed
+	precision when enabled, or does nothing otherwise.
+
+	(Losses computed inside are still computed in float32.)
+	"""
+	return torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_mixed_precision)
+
 # When training, how many records should we reserve for testing?
 test_proportion = 0.25
 
@@ -154,10 +154,19 @@ class GAN(modules.WCMIModule):
 				nn.LeakyReLU(0.1),
 				nn.Dropout(p=0.02),
 				nn.Linear(90, 1),
-				nn.Sigmoid(),
+				# (No sigmoid: the discriminator outputs a logit.)
 				#nn.BatchNorm1d(1),
 			)
 
+	def compile_layers(self):
+		"""
+		Compile the generator and the discriminator independently, since the
+		subnetwork selection decides which of them a forward pass uses.
+		"""
+		for subnetwork in (self.generator, self.discriminator):
+			if hasattr(subnetwork, "compile"):
+				subnetwork.compile()
+
 	def get_subnetwork_selection(self, subnetwork_selection=GANSubnetworkSelection.DEFAULT):
 		"""
 		Reduce a GANSubnetworkSelection value to GENERATOR_ONLY,
@@ -283,7 +292,8 @@ class GAN(modules.WCMIModule):
 
 		Discriminator only: 7 (num_sim_inputs) + 5 (num_sim_outputs) = 12
 		inputs are input as a combination of simulation inputs and simulation
-		outputs.  Output a single value (1 means real, 0 means generated).
+		outputs.  Output a single logit (after a sigmoid, 1 means real, 0
+		means generated).
 
 		Adversarial (both): feed input through the generator and then the
 		discriminator.
@@ -476,7 +486,12 @@ class Generator(nn.Module):
 			return a10
 
 class Discriminator(nn.Module):
-	"""The discriminator subnetwork of a GAN."""
+	"""
+	The discriminator subnetwork of a GAN.
+
+	It outputs a logit rather than a probability; apply a sigmoid to get the
+	probability that its input is real.
+	"""
 	if not custom_use_res_skips:
 		def __init__(self, num_sim_inputs, num_sim_outputs, *args, reverse=False, **kwargs):
 			super().__init__(*args, **kwargs)
@@ -491,7 +506,7 @@ class Discriminator(nn.Module):
 				nn.LeakyReLU(0.1),
 				nn.Dropout(p=0.02),
 				nn.Linear(90, 1),
-				nn.Sigmoid(),
+				# (No sigmoid: the discriminator outputs a logit.)
 				#nn.BatchNorm1d(1),
 			)
 
@@ -574,7 +589,7 @@ class Discriminator(nn.Module):
 				nn.Linear(256, 256),
 				nn.LeakyReLU(0.1),
 				nn.Linear(256, 1),
-				nn.Sigmoid(),
+				# (No sigmoid: the discriminator outputs a logit.)
 				#nn.BatchNorm1d(1),
 			)
 
@@ -7,7 +7,6 @@ package.
 """
 
 import pandas as pd
-import math
 import numpy as np
 import os
 import shutil
@@ -22,8 +21,24 @@ import wcmi.nn as wnn
 import wcmi.nn.data as data
 import wcmi.nn.dense as dense
 import wcmi.nn.gan as gan
+import wcmi.nn.prefetch as prefetch
 import wcmi.simulation as simulation
 
+def load_tensor_data(simulation_data, num_columns):
+	"""
+	Get the first num_columns columns of the loaded CSV data as a float32
+	tensor on the device.
+	"""
+	# Select the columns before converting to float32 so that only they are
+	# materialized, then share the buffer with torch rather than copying it
+	# again.  (If it's going to the GPU, pin it first so the copy can be
+	# asynchronous.)
+	npdata = np.ascontiguousarray(simulation_data.data.iloc[:, :num_columns].to_numpy(dtype=np.float32, copy=False))
+	tensor_data = torch.from_numpy(npdata)
+	if data.device.type == 'cuda':
+		tensor_data = tensor_data.pin_memory()
+	return tensor_data.to(data.device, non_blocking=True)
+
 def train(
 	use_gan=True, load_model_path=None, save_model_path=None,
 	load_data_path=None, save_data_path=None,
@@ -106,23 +121,22 @@ def train(
 	num_sim_out_columns    = simulation_data.simulation_info.num_sim_outputs
 	num_sim_in_out_columns = num_sim_in_columns + num_sim_out_columns
 
-	#npdata = simulation_data.data.values[:, :num_sim_in_out_columns]  # (No need for a numpy copy.)
-	all_data = torch.Tensor(simulation_data.data.values[:, :num_sim_in_out_columns]).to(data.device)
-	all_labels = all_data.view(all_data.shape)[:, :num_sim_in_columns]
-	all_input  = all_data.view(all_data.shape)[:, num_sim_in_columns:num_sim_in_out_columns]
+	all_data = load_tensor_data(simulation_data, num_sim_in_out_columns)
+	all_labels = all_data[:, :num_sim_in_columns]
+	all_input  = all_data[:, num_sim_in_columns:num_sim_in_out_columns]
 
 	# Get mean, stddev, min, and max of each input and label column for
 	# standardization or normalization.
-	all_nplabels  = all_labels.numpy()
-	all_npinput   = all_input.numpy()
-	label_means = torch.tensor(np.apply_along_axis(np.mean, axis=0, arr=all_nplabels))
-	label_stds  = torch.tensor(np.apply_along_axis(np.std,  axis=0, arr=all_nplabels))
-	label_mins  = torch.tensor(np.apply_along_axis(np.min,  axis=0, arr=all_nplabels))
-	label_maxs  = torch.tensor(np.apply_along_axis(np.max,  axis=0, arr=all_nplabels))
-	input_means = torch.tensor(np.apply_along_axis(np.mean, axis=0, arr=all_npinput))
-	input_stds  = torch.tensor(np.apply_along_axis(np.std,  axis=0, arr=all_npinput))
-	input_mins  = torch.tensor(np.apply_along_axis(np.min,  axis=0, arr=all_npinput))
-	input_maxs  = torch.tensor(np.apply_along_axis(np.max,  axis=0, arr=all_npinput))
+	#
+	# (The stddev is the population stddev, like numpy's default.)
+	label_means = all_labels.mean(dim=0)
+	label_stds  = all_labels.std(dim=0, unbiased=False)
+	label_mins  = all_labels.amin(dim=0)
+	label_maxs  = all_labels.amax(dim=0)
+	input_means = all_input.mean(dim=0)
+	input_stds  = all_input.std(dim=0, unbiased=False)
+	input_mins  = all_input.amin(dim=0)
+	input_maxs  = all_input.amax(dim=0)
 
 	if not reverse:
 		which_input_means  = input_means
@@ -147,17 +161,32 @@ def train(
 	#
 	# Optionally, the model might be randomly initialized if it hasn't been
 	# trained before.
+	#
+	# (The column stats are already on the device, since they were reduced
+	# from all_data.  The GAN has a set of input stats for each of its two
+	# inputs.)
 	mdl        = gan.GAN          if use_gan else dense.Dense
 	mdl_kwargs = {'gan_n': gan_n} if use_gan else {}
+	if not use_gan:
+		population_in_kwargs = dict(
+			population_mean_in=which_input_means,
+			population_std_in =which_input_stds,
+			population_min_in =which_input_mins,
+			population_max_in =which_input_maxs,
+		)
+	else:
+		population_in_kwargs = dict(
+			population_mean_in=[which_input_means, which_label_means],
+			population_std_in =[which_input_stds,  which_label_stds],
+			population_min_in =[which_input_mins,  which_label_mins],
+			population_max_in =[which_input_maxs,  which_label_maxs],
+		)
 	model = mdl(
 		load_model_path=load_model_path,
 		save_model_path=save_model_path,
 		auto_load_model=True,
 		reverse=reverse,
-		population_mean_in =which_input_means if not use_gan else [which_input_means, which_label_means],
-		population_std_in  =which_input_stds  if not use_gan else [which_input_stds,  which_label_stds],
-		population_min_in  =which_input_mins  if not use_gan else [which_input_mins,  which_label_mins],
-		population_max_in  =which_input_maxs  if not use_gan else [which_input_maxs,  which_label_maxs],
+		**population_in_kwargs,
 		population_mean_out=which_label_means,
 		population_std_out =which_label_stds,
 		population_min_out =which_label_mins,
@@ -168,6 +197,10 @@ def train(
 	# If CUDA is available, move the model to the GPU.
 	model = model.to(data.device)
 
+	# Compile the model's layers for the training loop.
+	if data.use_compile_models:
+		model.compile_layers()
+
 	# Make sure we're not trying to load an additional reversed model without GAN:
 	if load_reversed_model_path is not None and not use_gan:
 		raise WCMIError("error: train --dense doesn't support --load-reversed-model.")
@@ -218,6 +251,13 @@ def train(
 			#population_max_out =rev_label_maxs,
 			**mdl_kwargs,
 		)
+		reversed_model = reversed_model.to(data.device)
+
+		# The reversed model is run on every GAN batch too, so compile it
+		# like the model being trained.
+		if data.use_compile_models:
+			reversed_model.compile_layers()
+
 		reversed_gan_n = reversed_model.gan_n if reversed_use_gan else None
 
 	# Split data into training data and test data.  The test data will be
@@ -230,7 +270,12 @@ def train(
 	# Shuffle the rows of data.
 	#np.random.shuffle(npdata)
 	# c.f. https://stackoverflow.com/a/53284632
-	all_data = all_data[torch.randperm(all_data.size()[0])].to(data.device)
+	#
+	# (The permutation comes from the seeded CPU generator so that the split
+	# doesn't depend on the device; pin it so its copy to the GPU is
+	# asynchronous.)
+	split_perm = torch.randperm(all_data.size(0), pin_memory=data.device.type == 'cuda')
+	all_data = all_data[split_perm.to(data.device, non_blocking=True)]
 
 	# Restore randomness.
 	#torch.random.manual_seed(torch.random.seed())
@@ -238,16 +283,15 @@ def train(
 	# https://discuss.pytorch.org/t/initial-seed-too-large/28832
 	torch.random.manual_seed(torch.random.seed() & ((1<<63)-1))
 
-	testing_data = all_data.view(all_data.shape)[:num_testing_samples]
-	training_data = all_data.view(all_data.shape)[num_testing_samples:]
+	testing_data = all_data[:num_testing_samples]
+	training_data = all_data[num_testing_samples:]
 
-	testing_labels = testing_data.view(testing_data.shape)[:, :num_sim_in_columns]
-	testing_input  = testing_data.view(testing_data.shape)[:, num_sim_in_columns:num_sim_in_out_columns]
-	testing_gan_n  = testing_data.view(testing_data.shape)[:, num_sim_in_out_columns:]
+	testing_labels = testing_data[:, :num_sim_in_columns]
+	testing_input  = testing_data[:, num_sim_in_columns:num_sim_in_out_columns]
+	testing_gan_n  = testing_data[:, num_sim_in_out_columns:]
 
-	training_labels = training_data.view(training_data.shape)[:, :num_sim_in_columns]
-	training_input  = training_data.view(training_data.shape)[:, num_sim_in_columns:num_sim_in_out_columns]
-	training_gan_n  = training_data.view(training_data.shape)[:, num_sim_in_out_columns:]
+	# (The training input and labels are sliced from training_data after it
+	# is shuffled at the beginning of each epoch.)
 
 	# Ensure the GAN generation columns are correctly numbered.
 	if gan_force_fixed_gen_params:
@@ -266,12 +310,38 @@ def train(
 	# Let the user know on which device training is occurring.
 	logger.info("device: {0:s}".format(str(data.device)))
 
+	# Get each batch's slice of samples and whether a status line should be
+	# printed when it begins (if status is enabled for its epoch).  These are
+	# the same for every epoch.
+	#
+	# Example status_every_sample=4, batch_size=2:
+	# 	0*2=0  % 4=0  < 2
+	# 	1*2=2  % 4=2 !< 2
+	# 	2*2=4  % 4=0  < 2
+	# 	3*2=6  % 4=2 !< 2
+	# 	4*2=8  % 4=0  < 2
+	# 	5*2=10 % 4=2 !< 2
+	training_batch_slices = [slice(batch * batch_size, (batch + 1) * batch_size) for batch in range(num_training_batches)]  # i.e. [batch * batch_size:(batch + 1) * batch_size]
+	testing_batch_slices  = [slice(batch * batch_size, (batch + 1) * batch_size) for batch in range(num_testing_batches)]
+	training_batch_substatus = [
+		status_every_sample > 0 and batch * batch_size % status_every_sample < batch_size
+		for batch in range(num_training_batches)
+	]
+	testing_batch_substatus = [
+		status_every_sample > 0 and (batch + num_training_batches) * batch_size % status_every_sample < batch_size
+		for batch in range(num_testing_batches)
+	]
+
 	# Train the model.
 	if not use_gan:
-		# Get a tensor to store predictions for each epoch.  It will be
-		# overwritten at each epoch.
-		current_epoch_testing_errors = torch.zeros(testing_labels.shape, device=data.device, requires_grad=False)
-		current_epoch_training_errors = torch.zeros(training_labels.shape, device=data.device, requires_grad=False)
+		# Get a tensor to accumulate the sum of squared errors of each
+		# prediction column for each epoch.  It will be cleared at each epoch.
+		if not reverse:
+			current_epoch_testing_sq_sum = torch.zeros((num_sim_in_columns,), device=data.device, requires_grad=False)
+			current_epoch_training_sq_sum = torch.zeros((num_sim_in_columns,), device=data.device, requires_grad=False)
+		else:
+			current_epoch_testing_sq_sum = torch.zeros((num_sim_out_columns,), device=data.device, requires_grad=False)
+			current_epoch_training_sq_sum = torch.zeros((num_sim_out_columns,), device=data.device, requires_grad=False)
 
 		# After each epoch, set the corresponding element in this array to the
 		# calculated MSE accuracy.
@@ -314,32 +384,31 @@ def train(
 				logger.info("Beginning epoch #{0:,d}/{1:,d}.".format(epoch + 1, num_epochs))
 
 			# Shuffle the rows of data.
-			training_data = training_data[torch.randperm(training_data.size()[0])].to(data.device)
-
-			# Clear the error tensors for this epoch.
-			if not reverse:
-				current_epoch_testing_errors = torch.zeros(testing_labels.shape, out=current_epoch_testing_errors, device=data.device, requires_grad=False)
-				current_epoch_training_errors = torch.zeros(training_labels.shape, out=current_epoch_training_errors, device=data.device, requires_grad=False)
-			else:
-				current_epoch_testing_errors = torch.zeros(testing_input.shape, out=current_epoch_testing_errors, device=data.device, requires_grad=False)
-				current_epoch_training_errors = torch.zeros(training_input.shape, out=current_epoch_training_errors, device=data.device, requires_grad=False)
+			# (Generate the permutation on the device training_data is already
+			# on.)
+			perm = torch.randperm(training_data.size(0), device=data.device)
+			training_data = training_data[perm]
+			training_labels = training_data[:, :num_sim_in_columns]
+			training_input  = training_data[:, num_sim_in_columns:num_sim_in_out_columns]
+			training_gan_n  = training_data[:, num_sim_in_out_columns:]
+
+			# Clear the error sums for this epoch.
+			current_epoch_testing_sq_sum.zero_()
+			current_epoch_training_sq_sum.zero_()
 
 			# Zero the gradient.
-			optimizer.zero_grad()
+			optimizer.zero_grad(set_to_none=True)
 
 			# Training phase: run all training batches in the epoch.
-			for batch in range(num_training_batches):
-				if not status_enabled or status_every_sample <= 0:
-					substatus_enabled = False
-				else:
-					# Example:
-					# 	0*2=0  % 4=0  < 2
-					# 	1*2=2  % 4=2 !< 2
-					# 	2*2=4  % 4=0  < 2
-					# 	3*2=6  % 4=2 !< 2
-					# 	4*2=8  % 4=0  < 2
-					# 	5*2=10 % 4=2 !< 2
-					substatus_enabled = batch * batch_size % status_every_sample < batch_size
+			#
+			# Get each batch of samples from a prefetcher, which can copy the
+			# next batch to the device while this one is being trained on.
+			training_batches = prefetch.BatchPrefetcher(
+				zip(training_input.split(batch_size), training_labels.split(batch_size)),
+				device=data.device,
+			)
+			for batch, (batch_input, batch_labels) in enumerate(training_batches):
+				substatus_enabled = status_enabled and training_batch_substatus[batch]
 
 				# Print a status for the next sample?
 				if substatus_enabled:
@@ -350,29 +419,24 @@ def train(
 						num_epochs,
 					))
 
-				# Get this batch of samples.
-				batch_slice = slice(batch * batch_size, (batch + 1) * batch_size)  # i.e. [batch * batch_size:(batch + 1) * batch_size]
-
-				#batch_data   = training_data[batch_slice]
-				batch_input  = training_input[batch_slice]
-				batch_labels = training_labels[batch_slice]
-
-				# Forward pass.
-				if not reverse:
-					batch_output = model(batch_input)
-					loss = loss_function(batch_output, batch_labels)
-				else:
-					batch_output = model(batch_labels)
-					loss = loss_function(batch_output, batch_input)
+				# Forward pass (with mixed precision, if enabled).
+				with data.autocast():
+					if not reverse:
+						batch_output = model(batch_input)
+						loss = loss_function(batch_output, batch_labels)
+					else:
+						batch_output = model(batch_labels)
+						loss = loss_function(batch_output, batch_input)
 
 				if substatus_enabled:
 					logger.info("    MSE loss, mean of columns: {0:,f}".format(loss.item()))
 
-				# Record the errors for this batch.
+				# Accumulate the squared errors for this batch.
 				if not reverse:
-					current_epoch_training_errors[batch_slice] = batch_output.detach() - batch_labels.detach()
+					batch_errors = batch_output.detach() - batch_labels.detach()
 				else:
-					current_epoch_training_errors[batch_slice] = batch_output.detach() - batch_input.detach()
+					batch_errors = batch_output.detach() - batch_input.detach()
+				current_epoch_training_sq_sum += (batch_errors * batch_errors).sum(0)
 
 				# Backpropogate to calculate the gradient and then optimize to
 				# update the weights (parameters).
@@ -381,7 +445,7 @@ def train(
 
 			# Calculate the MSE for each prediction column (7-element vector),
 			# then assign it to epoch_mse_errors
-			current_epoch_training_mse = (current_epoch_training_errors**2).mean(0)
+			current_epoch_training_mse = current_epoch_training_sq_sum / num_training_samples
 			epoch_training_mse[epoch] = current_epoch_training_mse
 			current_epoch_training_mse_norm = current_epoch_training_mse.norm()
 			current_epoch_training_mse_mean = current_epoch_training_mse.mean()
@@ -390,22 +454,15 @@ def train(
 			#
 			# Disable gradient calculation during this phase with
 			# torch.no_grad() since we're not doing backpropagation here.
+			#
+			# (No mixed precision here: the testing MSE is the reported
+			# accuracy, so the predictions stay in full precision.)
 			with torch.no_grad():
 				# Now run the test batches.
 				for batch in range(num_testing_batches):
 					total_batch = batch + num_training_batches
 
-					if not status_enabled or status_every_sample <= 0:
-						substatus_enabled = False
-					else:
-						# Example:
-						# 	0*2=0  % 4=0  < 2
-						# 	1*2=2  % 4=2 !< 2
-						# 	2*2=4  % 4=0  < 2
-						# 	3*2=6  % 4=2 !< 2
-						# 	4*2=8  % 4=0  < 2
-						# 	5*2=10 % 4=2 !< 2
-						substatus_enabled = total_batch * batch_size % status_every_sample < batch_size
+					substatus_enabled = status_enabled and testing_batch_substatus[batch]
 
 					# Print a status for the next sample?
 					if substatus_enabled:
@@ -417,7 +474,7 @@ def train(
 						))
 
 					# Get this batch of samples.
-					batch_slice = slice(batch * batch_size, (batch + 1) * batch_size)  # i.e. [batch * batch_size:(batch + 1) * batch_size]
+					batch_slice = testing_batch_slices[batch]
 
 					#batch_data   = testing_data[batch_slice]
 					batch_input  = testing_input[batch_slice]
@@ -434,15 +491,16 @@ def train(
 					if substatus_enabled:
 						logger.info("    MSE loss, mean of columns: {0:,f}".format(loss.item()))
 
-					# Record the errors for this batch.
+					# Accumulate the squared errors for this batch.
 					if not reverse:
-						current_epoch_testing_errors[batch_slice] = batch_output.detach() - batch_labels.detach()
+						batch_errors = batch_output.detach() - batch_labels.detach()
 					else:
-						current_epoch_testing_errors[batch_slice] = batch_output.detach() - batch_input.detach()
+						batch_errors = batch_output.detach() - batch_input.detach()
+					current_epoch_testing_sq_sum += (batch_errors * batch_errors).sum(0)
 
 				# Calculate the MSE for each prediction column (7-element vector),
 				# then assign it to epoch_mse_errors
-				current_epoch_testing_mse = (current_epoch_testing_errors**2).mean(0)
+				current_epoch_testing_mse = current_epoch_testing_sq_sum / num_testing_samples
 				epoch_testing_mse[epoch] = current_epoch_testing_mse
 				current_epoch_testing_mse_norm = current_epoch_testing_mse.norm()
 				current_epoch_testing_mse_mean = current_epoch_testing_mse.mean()
@@ -467,8 +525,13 @@ def train(
 		last_testing_mse = epoch_testing_mse[-1]
 		last_training_mse = epoch_training_mse[-1]
 
-		all_nplabels = all_labels.numpy()
-		all_npinput  = all_input.numpy()
+		# Get the min, quartiles, and max of each label column with a single
+		# sort.
+		quantiles = torch.tensor([0.0, 0.25, 0.5, 0.75, 1.0], dtype=all_data.dtype, device=all_data.device)
+		if not reverse:
+			label_quantiles = torch.quantile(all_labels, quantiles, dim=0)
+		else:
+			label_quantiles = torch.quantile(all_input, quantiles, dim=0)
 
 		logger.info("")
 		logger.info("Done training last epoch.  Preparing statistics...")
@@ -480,13 +543,13 @@ def train(
 			"""
 			if tvec is not None:
 				return fmt.format(str(float_str_min_len)).format(
-					"<{0:s}>".format(", ".join(["{{0:{0:s},f}}".format(str(float_str_min_len)).format(component) for component in tvec])),
+					"<{0:s}>".format(", ".join(map("{{0:{0:s},f}}".format(str(float_str_min_len)).format, tvec.tolist()))),
 					tvec.norm(),
 					tvec.mean(),
 				)
 			elif lvec is not None:
 				return fmt.format(str(float_str_min_len)).format(
-					"<{0:s}>".format(", ".join(["{{0:>{0:s}s}}".format(str(float_str_min_len)).format(str(component)) for component in lvec])),
+					"<{0:s}>".format(", ".join(map("{{0:>{0:s}s}}".format(str(float_str_min_len)).format, map(str, lvec)))),
 				)
 			else:
 				return fmt
@@ -505,11 +568,11 @@ def train(
 				(False, "All labels var     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", all_labels.var(0), None),
 				(True,  "All labels stddev  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", all_labels.std(0), None),
 				(False, "", None, None),
-				(False, "All labels min     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_nplabels, 0, 0)), None),
-				(False, "...1st quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_nplabels, 0.25, 0)), None),
-				(False, "All labels median  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_nplabels, 0.5, 0)), None),
-				(False, "...3rd quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_nplabels, 0.75, 0)), None),
-				(False, "All labels max     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_nplabels, 1, 0)), None),
+				(False, "All labels min     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[0], None),
+				(False, "...1st quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[1], None),
+				(False, "All labels median  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[2], None),
+				(False, "...3rd quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[3], None),
+				(False, "All labels max     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[4], None),
 			)
 		else:
 			stat_fmts = (
@@ -526,11 +589,11 @@ def train(
 				(False, "All labels var     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", all_input.var(0), None),
 				(True,  "All labels stddev  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", all_input.std(0), None),
 				(False, "", None, None),
-				(False, "All labels min     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_npinput, 0, 0)), None),
-				(False, "...1st quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_npinput, 0.25, 0)), None),
-				(False, "All labels median  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_npinput, 0.5, 0)), None),
-				(False, "...3rd quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_npinput, 0.75, 0)), None),
-				(False, "All labels max     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", torch.Tensor(np.quantile(all_npinput, 1, 0)), None),
+				(False, "All labels min     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[0], None),
+				(False, "...1st quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[1], None),
+				(False, "All labels median  (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[2], None),
+				(False, "...3rd quartile    (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[3], None),
+				(False, "All labels max     (norm) (mean) : {{0:s}} ({{1:{0:s},f}}) ({{2:{0:s},f}})", label_quantiles[4], None),
 			)
 
 		def stat_fmt_lines(float_str_min_len):
@@ -538,6 +601,34 @@ def train(
 			return (*(
 				(white, stat_format(*vals, float_str_min_len=float_str_min_len)) for white, *vals in stat_fmts
 			),)
+		def stat_field_widths(fmt, tvec=None, lvec=None):
+			"""
+			Get the natural widths of the padded fields in a formatting line:
+			the vector's components, followed by the norm and mean for tvec.
+			"""
+			if tvec is not None:
+				return [len(component) for component in map("{0:,f}".format, (*tvec.tolist(), tvec.norm().item(), tvec.mean().item()))]
+			elif lvec is not None:
+				return [len(str(component)) for component in lvec]
+			else:
+				return []
+		def stat_fmt_line_lens_calculator():
+			"""
+			Format the stats lines once and return a function that, given a
+			float_str_min_len value, returns the length of each formatted line.
+
+			Each field is padded to float_str_min_len, so a line's length is
+			its unpadded length plus the padding each field receives.
+			"""
+			unpadded_lens = [len(stat_format(*vals, float_str_min_len=0)) for white, *vals in stat_fmts]
+			field_widths = [stat_field_widths(*vals) for white, *vals in stat_fmts]
+			def stat_fmt_line_lens(float_str_min_len):
+				"""Given a float_str_min_len value, return formatted stats line lengths."""
+				return [
+					unpadded_len + sum(max(0, float_str_min_len - width) for width in widths)
+					for unpadded_len, widths in zip(unpadded_lens, field_widths)
+				]
+			return stat_fmt_line_lens
 		def print_stat_fmt_lines(float_str_min_len, logger=logger):
 			"""Given a float_str_min_len value, print formatted stats lines."""
 			for white, line in stat_fmt_lines(float_str_min_len):
@@ -560,12 +651,16 @@ def train(
 				# start with.  Start at 30.
 				float_str_min_len = 30
 
+			# (Format the lines only once; the line lengths for each
+			# candidate are then calculated rather than formatted.)
+			stat_fmt_line_lens = stat_fmt_line_lens_calculator()
+
 			last_max_line_len_count = None
 			# Try decreasing to 0, inclusive.
 			for try_float_str_min_len in range(float_str_min_len, -1, -1):
-				lines = stat_fmt_lines(try_float_str_min_len)
-				max_line_len = max([len(line) for white, line in lines])
-				max_line_len_count = len([line for white, line in lines if len(line) >= max_line_len])
+				line_lens = stat_fmt_line_lens(try_float_str_min_len)
+				max_line_len = max(line_lens)
+				max_line_len_count = len([line_len for line_len in line_lens if line_len >= max_line_len])
 				if cols is None or max_line_len_count <= cols:
 					if last_max_line_len_count is not None and max_line_len_count < last_max_line_len_count:
 						break
@@ -619,8 +714,19 @@ def train(
 		# Train the GAN model instead of the Dense model.
 
 		# Define simple tensors for the actual GAN labels:
-		generated_labels = torch.full((batch_size, 1), gan.GAN.GENERATED_LABEL_ITEM, device=data.device)
-		real_labels      = torch.full((batch_size, 1), gan.GAN.REAL_LABEL_ITEM,      device=data.device)
+		#
+		# (Only the final batch can be smaller than batch_size; the others use
+		# these tensors as-is.)
+		generated_labels = torch.full((batch_size, 1), gan.GAN.GENERATED_LABEL_ITEM, dtype=torch.float32, device=data.device)
+		real_labels      = torch.full((batch_size, 1), gan.GAN.REAL_LABEL_ITEM,      dtype=torch.float32, device=data.device)
+
+		# A persistent buffer for random GAN generation parameters during
+		# training, refilled in place for each batch.
+		training_gan_gen_params = torch.empty((batch_size, gan_n), device=data.device)
+
+		# Likewise for the testing phase, but refilled all at once for each
+		# epoch and sliced per batch.
+		testing_gan_gen_params = torch.empty((num_testing_samples, gan_n), device=data.device)
 
 		# Keep the generator and the discriminator loss in balance.  If the
 		# loss of the other is more than threshold times this value, pause
@@ -632,8 +738,10 @@ def train(
 		current_epoch_num_generator_training_samples = 0
 		current_epoch_num_discriminator_training_samples = 0
 		# discriminator_real_loss, discriminator_generated_loss, generator_loss
-		current_epoch_training_losses = torch.zeros((num_training_samples,3,), device=data.device, requires_grad=False)
-		current_epoch_testing_losses = torch.zeros((num_testing_samples,3,), device=data.device, requires_grad=False)
+		#
+		# (Allocated once: every row is overwritten each epoch.)
+		current_epoch_training_losses = torch.empty((num_training_samples,3,), device=data.device, requires_grad=False)
+		current_epoch_testing_losses = torch.empty((num_testing_samples,3,), device=data.device, requires_grad=False)
 
 		# Per-epoch losses.
 		#
@@ -680,7 +788,10 @@ def train(
 		epoch_losses = torch.zeros((num_epochs, len(epoch_losses_columns),), device=data.device, requires_grad=False)
 
 		# Define the loss function and the optimizers.
-		loss_function = nn.BCELoss(reduction="none")
+		#
+		# (The discriminator outputs logits, so the sigmoid is fused into the
+		# loss.)
+		loss_function = nn.BCEWithLogitsLoss(reduction="none")
 
 		# Give the optimizer a reference to our model's parameters, which
 		# include the model's weights and biases.  The optimizer will update
@@ -720,40 +831,32 @@ def train(
 				logger.info("Beginning epoch #{0:,d}/{1:,d}.".format(epoch + 1, num_epochs))
 
 			# Shuffle the rows of data.
-			training_data = training_data[torch.randperm(training_data.size()[0])].to(data.device)
+			# (Generate the permutation on the device training_data is already
+			# on.)
+			perm = torch.randperm(training_data.size(0), device=data.device)
+			training_data = training_data[perm]
+			training_labels = training_data[:, :num_sim_in_columns]
+			training_input  = training_data[:, num_sim_in_columns:num_sim_in_out_columns]
+			training_gan_n  = training_data[:, num_sim_in_out_columns:]
 
 			# Clear the current epoch data for this epoch.
+			#
+			# (current_epoch_training_losses and current_epoch_testing_losses
+			# need no clearing: every batch overwrites its own slice, and the
+			# batches cover every sample.)
 			current_epoch_num_generator_training_samples = 0
 			current_epoch_num_discriminator_training_samples = 0
-			# discriminator_real_loss, discriminator_generated_loss, generator_loss
-			current_epoch_training_losses = torch.zeros(
-				current_epoch_training_losses.shape,
-				out=current_epoch_training_losses,
-				device=data.device, requires_grad=False,
-			)
-			current_epoch_testing_losses = torch.zeros(
-				current_epoch_testing_losses.shape,
-				out=current_epoch_testing_losses,
-				device=data.device, requires_grad=False,
-			)
-
-			# Zero the gradient.
-			generator_optimizer.zero_grad()
-			discriminator_optimizer.zero_grad()
 
 			# Training phase: run all training batches in the epoch.
-			for batch in range(num_training_batches):
-				if not status_enabled or status_every_sample <= 0:
-					substatus_enabled = False
-				else:
-					# Example:
-					# 	0*2=0  % 4=0  < 2
-					# 	1*2=2  % 4=2 !< 2
-					# 	2*2=4  % 4=0  < 2
-					# 	3*2=6  % 4=2 !< 2
-					# 	4*2=8  % 4=0  < 2
-					# 	5*2=10 % 4=2 !< 2
-					substatus_enabled = batch * batch_size % status_every_sample < batch_size
+			#
+			# Get each batch of samples from a prefetcher, which can copy the
+			# next batch to the device while this one is being trained on.
+			training_batches = prefetch.BatchPrefetcher(
+				zip(training_input.split(batch_size), training_labels.split(batch_size), training_gan_n.split(batch_size)),
+				device=data.device,
+			)
+			for batch, (batch_input, batch_labels, batch_gan_n) in enumerate(training_batches):
+				substatus_enabled = status_enabled and training_batch_substatus[batch]
 
 				# Print a status for the next sample?
 				if substatus_enabled:
@@ -764,23 +867,23 @@ def train(
 						num_epochs,
 					))
 
-				# Get this batch of samples.
-				batch_slice = slice(batch * batch_size, (batch + 1) * batch_size)  # i.e. [batch * batch_size:(batch + 1) * batch_size]
+				# Get this batch's slice for recording its losses.
+				batch_slice = training_batch_slices[batch]
 
-				#batch_data             = training_data[batch_slice]
-				batch_input            = training_input[batch_slice]
-				batch_labels           = training_labels[batch_slice]
-
-				batch_generated_labels = generated_labels[:len(batch_input)]
-				batch_real_labels      = real_labels[:len(batch_input)]
+				if len(batch_input) == batch_size:
+					batch_generated_labels = generated_labels
+					batch_real_labels      = real_labels
+				else:
+					batch_generated_labels = generated_labels[:len(batch_input)]
+					batch_real_labels      = real_labels[:len(batch_input)]
 
 				# Does the user want fixed GAN generation parameters?
 				if gan_force_fixed_gen_params:
-					gan_gen_params = training_gan_n.view(training_gan_n.shape)[batch_slice]
+					gan_gen_params = batch_gan_n
 				else:
 					# Don't use fixed GAN generation parameters.
 					# Generate random generation parameters.
-					gan_gen_params = torch.rand((len(batch_input), gan_n), device=data.device)
+					gan_gen_params = training_gan_gen_params[:len(batch_input)].uniform_()
 
 				# Train:
 				# 	Discriminator:
@@ -789,69 +892,82 @@ def train(
 				# 	Generator:
 				# 		Same generated data in the previous step.
 
-				# Forward passes.
+				# Forward passes (with mixed precision, if enabled).
+				with data.autocast():
+					# Generate a batch of generated_data
+					if not reverse:
+						generator_output = model(batch_input, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+					else:
+						generator_output = model(batch_labels, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
 
-				# Discriminator: forward pass one batch of real data.
-				if not reverse:
-					discriminator_real_output = model(batch_input, batch_labels, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-					discriminator_real_loss_unreduced = loss_function(discriminator_real_output, batch_real_labels)
-				else:
-					discriminator_real_output = model(batch_labels, batch_input, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
+					# Discriminator: forward pass one batch of real data.
+					#
+					# (The real and generated batches are passed separately,
+					# not concatenated, so that the discriminator's batch
+					# normalization sees each kind of batch on its own.)
+					if not reverse:
+						discriminator_real_output = model(batch_input, batch_labels, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
+					else:
+						discriminator_real_output = model(batch_labels, batch_input, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
 					discriminator_real_loss_unreduced = loss_function(discriminator_real_output, batch_real_labels)
-				discriminator_real_loss = discriminator_real_loss_unreduced.mean()
-
-				# Generate a batch of generated_data
-				if not reverse:
-					generator_output = model(batch_input, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
-				else:
-					generator_output = model(batch_labels, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+					discriminator_real_loss = discriminator_real_loss_unreduced.mean()
 
-				if reversed_model is None:
-					batch_estimated_generated_labels = batch_generated_labels
-					batch_estimated_real_labels = batch_real_labels
-				else:
-					if reversed_use_gan:
-						# For now, just support generating random noise to the reversed GAN.
-						reversed_gan_gen_params = torch.rand((len(batch_input), reversed_model.gan_n), device=data.device)
-						reversed_output = reversed_model(generator_output, reversed_gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
-					else:
-						reversed_output = reversed_model(generator_output)
-
-					# We generated predicted sim input (vs labels) and the
-					# reversed network gave us sim output predictions (vs
-					# inputs) for the generated predicted sim input.  How close
-					# is the real "output" (batch_input) to the
-					# reversed_model(generator(batch_input)), compared to the
-					# stddevs of the batch_input columns (input_stds)?
+					# Discriminator: forward pass one batch of generated data.
 					#
-					# The estimated generated label must be in the range [0, 1].
-					# Get the distance of
-					# reversed_model(generator(batch_input)) from batch_input
-					# in terms of input stddevs (in [0, inf)), and feed that into tanh ([0, 1)).
+					# (The generated data is detached here so that training the
+					# discriminator doesn't backpropagate into the generator.)
 					if not reverse:
-						batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/input_stds)), dim=1, keepdim=True).detach()
+						discriminator_generated_output = model(batch_input, generator_output.detach(), subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
 					else:
-						batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/label_stds)), dim=1, keepdim=True).detach()
-					batch_estimated_real_labels = 1 - batch_estimated_generated_labels
+						discriminator_generated_output = model(batch_labels, generator_output.detach(), subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
 
-				# Discriminator: forward pass one batch of generated data.
-				if not reverse:
-					discriminator_generated_output = model(batch_input, batch_labels, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-				else:
-					discriminator_generated_output = model(batch_labels, batch_input, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-				if data.no_underconfident_discriminator and reversed_model is not None:
-					# If configured, only correct the discriminator when it is more confident that it is real than we are.
-					batch_estimated_generated_labels = torch.min(discriminator_generated_output, batch_estimated_generated_labels).detach()
-				discriminator_generated_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_generated_labels)
-				discriminator_generated_loss = discriminator_generated_loss_unreduced.mean()
+					if reversed_model is None:
+						batch_estimated_generated_labels = batch_generated_labels
+						batch_estimated_real_labels = batch_real_labels
+					else:
+						if reversed_use_gan:
+							# For now, just support generating random noise to the reversed GAN.
+							reversed_gan_gen_params = torch.rand((len(batch_input), reversed_model.gan_n), device=data.device)
+							reversed_output = reversed_model(generator_output, reversed_gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+						else:
+							reversed_output = reversed_model(generator_output)
 
-				# Get the mean discriminator loss.
-				#discriminator_loss_unreduced = discriminator_real_loss + (discriminator_generated_loss - discriminator_real_loss)/2
-				discriminator_loss = np.mean((discriminator_real_loss.item(), discriminator_generated_loss.item()))
+						# We generated predicted sim input (vs labels) and the
+						# reversed network gave us sim output predictions (vs
+						# inputs) for the generated predicted sim input.  How close
+						# is the real "output" (batch_input) to the
+						# reversed_model(generator(batch_input)), compared to the
+						# stddevs of the batch_input columns (input_stds)?
+						#
+						# The estimated generated label must be in the range [0, 1].
+						# Get the distance of
+						# reversed_model(generator(batch_input)) from batch_input
+						# in terms of input stddevs (in [0, inf)), and feed that into tanh ([0, 1)).
+						if not reverse:
+							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/input_stds)), dim=1, keepdim=True).detach()
+						else:
+							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/label_stds)), dim=1, keepdim=True).detach()
+						batch_estimated_real_labels = 1 - batch_estimated_generated_labels
 
-				# Generator: get loss for the same forward pass.
-				generator_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_real_labels)
-				generator_loss = generator_loss_unreduced.mean()
+					# Discriminator: loss for the batch of generated data.
+					if data.no_underconfident_discriminator and reversed_model is not None:
+						# If configured, only correct the discriminator when it is more confident that it is real than we are.
+						batch_estimated_generated_labels = torch.min(torch.sigmoid(discriminator_generated_output), batch_estimated_generated_labels).detach()
+					discriminator_generated_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_generated_labels)
+					discriminator_generated_loss = discriminator_generated_loss_unreduced.mean()
+
+					# Get the mean discriminator loss.
+					#discriminator_loss_unreduced = discriminator_real_loss + (discriminator_generated_loss - discriminator_real_loss)/2
+					#
+					# (Keep it on the device; it's only synced when deciding whether
+					# to pause.)
+					discriminator_loss = torch.stack((discriminator_real_loss.detach(), discriminator_generated_loss.detach())).mean()
+
+					# Generator: get loss for the same forward pass.  (This is only
+					# for recording and pausing; the generator is trained on a
+					# separate pass below.)
+					generator_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_real_labels)
+					generator_loss = generator_loss_unreduced.mean()
 
 				# Determine which subnetwork trainings to pause.
 				if not gan_enable_pause:
@@ -870,8 +986,11 @@ def train(
 					pause_discriminator = False
 					pause_generator     = False
 				else:
-					pause_discriminator = discriminator_loss <= generator_loss - pause_threshold
-					pause_generator     = generator_loss <= discriminator_loss - pause_threshold
+					# (Get both decisions with a single sync.)
+					pause_discriminator, pause_generator = torch.stack((
+						discriminator_loss <= generator_loss.detach() - pause_threshold,
+						generator_loss.detach() <= discriminator_loss - pause_threshold,
+					)).tolist()
 
 				# Train the discriminator if it isn't outperforming the
 				# generator by too much.
@@ -880,10 +999,15 @@ def train(
 
 					# Backpropogate to calculate the gradient and then optimize to
 					# update the weights (parameters).
-					discriminator_real_loss.backward(retain_graph=True)
-					discriminator_optimizer.step()
-
-					discriminator_generated_loss.backward(retain_graph=not pause_generator)
+					#
+					# (Backpropagate the sum of the real and generated losses
+					# once, without retaining the graphs, and take one step.)
+					#
+					# Zero the gradient first, so that the step doesn't also
+					# apply the gradients left in the discriminator by earlier
+					# batches, including the generator's adversarial passes.
+					discriminator_optimizer.zero_grad(set_to_none=True)
+					(discriminator_real_loss + discriminator_generated_loss).backward()
 					discriminator_optimizer.step()
 
 				# Train the generator if it isn't outperforming the
@@ -891,27 +1015,44 @@ def train(
 				if not pause_generator:
 					current_epoch_num_generator_training_samples += len(batch_input)
 
-					generator_loss.backward()
+					# Pass the generated data through the (possibly just
+					# updated) discriminator, this time backpropagating into
+					# the generator.
+					with data.autocast():
+						if not reverse:
+							adversarial_output = model(batch_input, generator_output, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
+						else:
+							adversarial_output = model(batch_labels, generator_output, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
+						adversarial_loss = loss_function(adversarial_output, batch_estimated_real_labels).mean()
+
+					# (The adversarial pass also leaves gradients in the
+					# discriminator; they are cleared before its next step.)
+					generator_optimizer.zero_grad(set_to_none=True)
+					adversarial_loss.backward()
 					generator_optimizer.step()
 
-				# Record the losses for this batch.
-				current_epoch_training_losses[batch_slice] = torch.stack(
-					(discriminator_real_loss_unreduced.detach()[:, 0], discriminator_generated_loss_unreduced.detach()[:, 0], generator_loss_unreduced.detach()[:, 0]),
-					axis=1,
-				)
+				# Record the losses for this batch, copying each directly into
+				# its column.
+				batch_losses = current_epoch_training_losses[batch_slice]
+				batch_losses[:, 0].copy_(discriminator_real_loss_unreduced.detach()[:, 0])
+				batch_losses[:, 1].copy_(discriminator_generated_loss_unreduced.detach()[:, 0])
+				batch_losses[:, 2].copy_(generator_loss_unreduced.detach()[:, 0])
+
+			# Generate this epoch's random testing generation parameters in
+			# one go.
+			if not gan_force_fixed_gen_params:
+				testing_gan_gen_params.uniform_()
 
 			# Perform the testing phase for this epoch.
 			#
-			# Disable gradient calculation during this phase with
-			# torch.no_grad() since we're not doing backpropagation here.
-			with torch.no_grad():
+			# Disable gradient calculation and autograd's bookkeeping during
+			# this phase with torch.inference_mode() since we're not doing
+			# backpropagation here, and use mixed precision, if enabled.
+			with torch.inference_mode(), data.autocast():
 				for batch in range(num_testing_batches):
 					total_batch = batch + num_training_batches
 
-					if not status_enabled or status_every_sample <= 0:
-						substatus_enabled = False
-					else:
-						substatus_enabled = total_batch * batch_size % status_every_sample < batch_size
+					substatus_enabled = status_enabled and testing_batch_substatus[batch]
 
 					# Print a status for the next sample?
 					if substatus_enabled:
@@ -923,22 +1064,26 @@ def train(
 						))
 
 					# Get this batch of samples.
-					batch_slice = slice(batch * batch_size, (batch + 1) * batch_size)  # i.e. [batch * batch_size:(batch + 1) * batch_size]
+					batch_slice = testing_batch_slices[batch]
 
 					#batch_data             = testing_data[batch_slice]
 					batch_input            = testing_input[batch_slice]
 					batch_labels           = testing_labels[batch_slice]
 
-					batch_generated_labels = generated_labels[:len(batch_input)]
-					batch_real_labels      = real_labels[:len(batch_input)]
+					if len(batch_input) == batch_size:
+						batch_generated_labels = generated_labels
+						batch_real_labels      = real_labels
+					else:
+						batch_generated_labels = generated_labels[:len(batch_input)]
+						batch_real_labels      = real_labels[:len(batch_input)]
 
 					# Does the user want fixed GAN generation parameters?
 					if gan_force_fixed_gen_params:
-						gan_gen_params = testing_gan_n.view(testing_gan_n.shape)[batch_slice]
+						gan_gen_params = testing_gan_n[batch_slice]
 					else:
 						# Don't use fixed GAN generation parameters.
 						# Generate random generation parameters.
-						gan_gen_params = torch.rand((len(batch_input), gan_n), device=data.device)
+						gan_gen_params = testing_gan_gen_params[batch_slice]
 
 					# Testing:
 					# 	Discriminator:
@@ -949,20 +1094,28 @@ def train(
 
 					# Forward passes.
 
+					# Generate a batch of generated_data
+					if not reverse:
+						generator_output = model(batch_input, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+					else:
+						generator_output = model(batch_labels, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+
 					# Discriminator: forward pass one batch of real data.
+					#
+					# (As in training, the real and generated batches are
+					# passed separately so that the discriminator's batch
+					# normalization sees each kind of batch on its own.)
 					if not reverse:
 						discriminator_real_output = model(batch_input, batch_labels, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-						discriminator_real_loss_unreduced = loss_function(discriminator_real_output, batch_real_labels)
 					else:
 						discriminator_real_output = model(batch_labels, batch_input, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-						discriminator_real_loss_unreduced = loss_function(discriminator_real_output, batch_real_labels)
-					discriminator_real_loss = discriminator_real_loss_unreduced.mean()
+					discriminator_real_loss_unreduced = loss_function(discriminator_real_output, batch_real_labels)
 
-					# Generate a batch of generated_data
+					# Discriminator: forward pass one batch of generated data.
 					if not reverse:
-						generator_output = model(batch_input, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+						discriminator_generated_output = model(batch_input, generator_output, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
 					else:
-						generator_output = model(batch_labels, gan_gen_params, subnetwork_selection=gan.GAN.GANSubnetworkSelection.GENERATOR_ONLY)
+						discriminator_generated_output = model(batch_labels, generator_output, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
 
 					if reversed_model is None:
 						batch_estimated_generated_labels = batch_generated_labels
@@ -987,50 +1140,39 @@ def train(
 						# reversed_model(generator(batch_input)) from batch_input
 						# in terms of input stddevs (in [0, inf)), and feed that into tanh ([0, 1)).
 						if not reverse:
-							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/input_stds)), dim=1, keepdim=True).detach()
+							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/input_stds)), dim=1, keepdim=True)
 						else:
-							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/label_stds)), dim=1, keepdim=True).detach()
+							batch_estimated_generated_labels = torch.mean(torch.tanh(torch.abs((reversed_output - batch_input)/label_stds)), dim=1, keepdim=True)
 						batch_estimated_real_labels = 1 - batch_estimated_generated_labels
 
-					# Discriminator: forward pass one batch of generated data.
-					if not reverse:
-						discriminator_generated_output = model(batch_input, batch_labels, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-						discriminator_generated_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_generated_labels)
-					else:
-						discriminator_generated_output = model(batch_labels, batch_input, subnetwork_selection=gan.GAN.GANSubnetworkSelection.DISCRIMINATOR_ONLY)
-						discriminator_generated_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_generated_labels)
-					discriminator_generated_loss = discriminator_generated_loss_unreduced.mean()
+					# Discriminator: loss for the batch of generated data.
+					discriminator_generated_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_generated_labels)
 
 					# Generator: get loss for the same forward pass.
 					generator_loss_unreduced = loss_function(discriminator_generated_output, batch_estimated_real_labels)
-					generator_loss = generator_loss_unreduced.mean()
 
-					# Record the losses for this batch.
-					current_epoch_testing_losses[batch_slice] = torch.stack(
-						(discriminator_real_loss_unreduced.detach()[:, 0], discriminator_generated_loss_unreduced.detach()[:, 0], generator_loss_unreduced.detach()[:, 0]),
-						axis=1,
-					)
+					# Record the losses for this batch, copying each directly
+					# into its column.
+					batch_losses = current_epoch_testing_losses[batch_slice]
+					batch_losses[:, 0].copy_(discriminator_real_loss_unreduced[:, 0])
+					batch_losses[:, 1].copy_(discriminator_generated_loss_unreduced[:, 0])
+					batch_losses[:, 2].copy_(generator_loss_unreduced[:, 0])
 
 			# We're almost done with this epoch.  Just store our results for
 			# this epoch.
 
-			# "training_mean_discriminator_real_bce_loss"
-			epoch_losses[epoch][0] = current_epoch_training_losses[:, 0].mean().item()
-
-			# "training_mean_discriminator_generated_bce_loss"
-			epoch_losses[epoch][1] = current_epoch_training_losses[:, 1].mean().item()
-
+			# "training_mean_discriminator_real_bce_loss",
+			# "training_mean_discriminator_generated_bce_loss",
 			# "training_mean_generator_bce_loss"
-			epoch_losses[epoch][2] = current_epoch_training_losses[:, 2].mean().item()
-
-			# "testing_mean_discriminator_real_bce_loss"
-			epoch_losses[epoch][3] = current_epoch_testing_losses[:, 0].mean().item()
-
-			# "testing_mean_discriminator_generated_bce_loss"
-			epoch_losses[epoch][4] = current_epoch_testing_losses[:, 1].mean().item()
+			#
+			# (Reduce all three columns at once and keep the means on the
+			# device rather than synchronizing for each one.)
+			epoch_losses[epoch, 0:3] = current_epoch_training_losses.mean(dim=0)
 
+			# "testing_mean_discriminator_real_bce_loss",
+			# "testing_mean_discriminator_generated_bce_loss",
 			# "testing_mean_generator_bce_loss"
-			epoch_losses[epoch][5] = current_epoch_testing_losses[:, 2].mean().item()
+			epoch_losses[epoch, 3:6] = current_epoch_testing_losses.mean(dim=0)
 
 			# "num_training_samples"
 			epoch_losses[epoch][6] = num_training_samples
@@ -1043,20 +1185,23 @@ def train(
 
 			# Let the user know we've finished this epoch.
 			if status_enabled:
+				# Copy this epoch's results to the CPU in one go.
+				current_epoch_losses = epoch_losses[epoch].tolist()
+
 				logger.info(
 					"Done training epoch #{0:,d}/{1:,d} (mean testing gen, disc_real, disc_gen loss: {2:f}, {3:f}, {4:f}) (mean training gen, disc_real, disc_gen loss: {5:f}, {6:f}, {7:f}) (paused gen, disc: {8:d}, {9:d}).".format(
 						epoch + 1,
 						num_epochs,
 
-						epoch_losses[epoch][0],
-						epoch_losses[epoch][1],
-						epoch_losses[epoch][2],
-						epoch_losses[epoch][3],
-						epoch_losses[epoch][4],
-						epoch_losses[epoch][5],
+						current_epoch_losses[0],
+						current_epoch_losses[1],
+						current_epoch_losses[2],
+						current_epoch_losses[3],
+						current_epoch_losses[4],
+						current_epoch_losses[5],
 
-						int(round(epoch_losses[epoch][7].item())),
-						int(round(epoch_losses[epoch][8].item())),
+						int(round(current_epoch_losses[7])),
+						int(round(current_epoch_losses[8])),
 					)
 				)
 
@@ -1066,18 +1211,21 @@ def train(
 
 		# Did the user specify to save BCE errors?
 		if save_data_path is not None:
-			bce_output = pd.DataFrame(
-				data=epoch_losses,
-				columns=epoch_losses_columns,
-			)
-			# c.f. https://stackoverflow.com/a/41591077
-			for int_column in [
+			# Write the float array directly, formatting the sample count
+			# columns as integers.  (%.9g round-trips float32.)
+			int_columns = [
 				"num_training_samples",
 				"num_discriminator_training_paused",
 				"num_generator_training_paused",
-			]:
-				bce_output[int_column] = bce_output[int_column].astype(int)
-			bce_output.to_csv(save_data_path, index=False)
+			]
+			np.savetxt(
+				save_data_path,
+				epoch_losses.cpu().numpy(),
+				fmt=["%d" if column in int_columns else "%.9g" for column in epoch_losses_columns],
+				delimiter=",",
+				header=",".join(epoch_losses_columns),
+				comments="",
+			)
 
 			logger.info("")
 			logger.info("Wrote training epoch data to `{0:s}'.".format(save_data_path))
@@ -1145,11 +1293,10 @@ def run(
 	num_sim_out_columns    = simulation_data.simulation_info.num_sim_outputs
 	num_sim_in_out_columns = num_sim_in_columns + num_sim_out_columns
 
-	#npdata = simulation_data.data.values[:, :num_sim_in_out_columns]  # (No need for a numpy copy.)
-	all_data = torch.tensor(simulation_data.data.values[:, :num_sim_in_out_columns], dtype=torch.float32, device=data.device, requires_grad=False)
-	all_labels = all_data.view(all_data.shape)[:, :num_sim_in_columns]
-	all_input  = all_data.view(all_data.shape)[:, num_sim_in_columns:num_sim_in_out_columns]
-	all_gan_n  = all_data.view(all_data.shape)[:, num_sim_in_out_columns:]
+	all_data = load_tensor_data(simulation_data, num_sim_in_out_columns)
+	all_labels = all_data[:, :num_sim_in_columns]
+	all_input  = all_data[:, num_sim_in_columns:num_sim_in_out_columns]
+	all_gan_n  = all_data[:, num_sim_in_out_columns:]
 
 	if all_gan_n.shape[1] != gan_n and all_gan_n.shape[1] != 0:
 		raise WCMIError(
@@ -1180,7 +1327,7 @@ def run(
 				all_output = model(all_input, gan_gen_params)
 			else:
 				all_output = model(all_labels, gan_gen_params)
-	npoutput=all_output.numpy()
+	npoutput=all_output.cpu().numpy()
 
 	## Reconstruct the Pandas frame with appropriate columns.
 	input_columns = simulation_data.data.columns.values.tolist()
@@ -1199,7 +1346,7 @@ def run(
 		(
 			npdata_extra[:, :num_sim_in_out_columns],
 			npoutput,
-			npdata_extra[:, num_sim_in_out_columns:] if gan_fixed_gen or gan_gen_params is None else gan_gen_params.numpy(),
+			npdata_extra[:, num_sim_in_out_columns:] if gan_fixed_gen or gan_gen_params is None else gan_gen_params.cpu().numpy(),
 		),
 		axis=1,
 	)
@@ -1226,13 +1373,11 @@ def run(
 	if not output_keep_out_of_bounds_samples:
 		# Get a mask of np.array([True, True, True, False, True, ...]) as to which rows are
 		# valid.
-		input_npmins_repeated = np.repeat(np.array([input_npmins]), npoutput.shape[0], axis=0)
-		input_npmaxs_repeated = np.repeat(np.array([input_npmaxs]), npoutput.shape[0], axis=0)
-		min_valid_npoutput = npoutput >= input_npmins_repeated
-		max_valid_npoutput = npoutput <= input_npmaxs_repeated
-		valid_npoutput = np.logical_and(min_valid_npoutput, max_valid_npoutput)
-		#valid_npoutput_samples = np.apply_along_axis(all, axis=1, arr=valid_npoutput)[:,np.newaxis]  # Reduce rows by "and".
-		valid_npoutput_mask = np.apply_along_axis(all, axis=1, arr=valid_npoutput)  # Reduce rows by "and" and get a flat, 1-D vector.
+		# (The per-column bounds broadcast across the rows.  Check them on
+		# the device and only copy the mask back.)
+		input_mins = torch.as_tensor(input_npmins, device=data.device)
+		input_maxs = torch.as_tensor(input_npmaxs, device=data.device)
+		valid_npoutput_mask = ((all_output >= input_mins) & (all_output <= input_maxs)).all(dim=1).cpu().numpy()  # Reduce rows by "and" and get a flat, 1-D vector.
 
 		# Only keep valid rows in output.
 		old_num_samples = len(output)
@@ -1249,10 +1394,10 @@ def run(
 
 	# Make sure the output isn't all the same.
 	if len(npoutput) >= 2:
-		npoutput_means = np.apply_along_axis(np.std, axis=0, arr=npoutput)
-		npoutput_stds = np.apply_along_axis(np.std, axis=0, arr=npoutput)
+		npoutput_stds = all_output.std(dim=0, unbiased=False).cpu().numpy()
 		# Warn if the std is <= this * (max_bound - min_bound).
 		std_warn_threshold = 0.1
+		std_warn_thresholds = std_warn_threshold * (input_npmaxs - input_npmins)
 		num_warnings = 0
 		# (Per-column.)
 		unique_warn_threshold = 25
@@ -1260,11 +1405,6 @@ def run(
 		min_val, max_val = np.min(npoutput), np.max(npoutput)
 		max_val_str_len = max(len(str(min_val)), len(str(max_val)))
 
-		all_unique = np.unique(npoutput)
-
-		min_unique_val, max_unique_val = np.min(all_unique), np.max(all_unique)
-		max_unique_val_str_len = max(len(str(min_unique_val)), len(str(max_unique_val)))
-
 		if not model.reverse:
 			columns_check = simulation_data.data.columns.values[:simulation_data.simulation_info.num_sim_inputs]
 		else:
@@ -1275,7 +1415,7 @@ def run(
 
 			if not model.reverse:
 				std = npoutput_stds[idx]
-				this_threshold = std_warn_threshold * (input_npmaxs[idx] - input_npmins[idx])
+				this_threshold = std_warn_thresholds[idx]
 				if std <= 0.0:
 					logger.warning("WARNING: all predictions for simulation input parameter #{0:d} (`{1:s}`) are the same!  Prediction: {2:,f}.".format(idx + 1, name, npoutput[0][idx]))
 					num_warnings += 1
@@ -1284,7 +1424,7 @@ def run(
 					num_warnings += 1
 			else:
 				std = npoutput_stds[idx]
-				this_threshold = std_warn_threshold * (input_npmaxs[idx] - input_npmins[idx])
+				this_threshold = std_warn_thresholds[idx]
 				if std <= 0.0:
 					logger.warning("WARNING: all predictions for simulation output parameter #{0:d} (`{1:s}`) are the same!  Prediction: {2:,f}.".format(idx + 1, name, npoutput[0][idx]))
 					num_warnings += 1
@@ -1295,9 +1435,10 @@ def run(
 			# Count unique values and warn if there are few.
 			col = npoutput[:,idx]
 			#unique = set(npoutput[:,idx].tolist())
-			unique = np.unique(npoutput[:,idx])
+			unique, unique_counts = np.unique(col, return_counts=True)
 
-			min_unique_val, max_unique_val = np.min(unique), np.max(unique)
+			# (np.unique's output is sorted.)
+			min_unique_val, max_unique_val = unique[0], unique[-1]
 			max_unique_val_str_len = max(len(str(min_unique_val)), len(str(max_unique_val)))
 
 			if len(unique) <= unique_warn_threshold:
@@ -1312,73 +1453,61 @@ def run(
 					))
 					num_warnings += 1
 
-				max_unique = max(unique)
+				max_unique = max_unique_val
 				len_str_max_unique = len(str(max_unique))
 
 				min_val_str_len = max_unique_val_str_len if True else len_str_max_unique
 
+				# Count each unique value's predictions.  (math.isclose's
+				# default rel_tol=1e-9 is below float32's spacing, so "close"
+				# values are just equal ones, and np.unique's counts give both.)
 				float_groups = []
-				visited = set()
-				for val in sorted(list(unique)):
-					if val not in visited:
-						visited.add(val)
-						lines = []
-
-						count_eq    = len([x for x in col if x == val])
-						close_values = [x for x in col if math.isclose(x, val)]
-						count_close = len(close_values)
-
-						float_groups.append((count_close, val, lines))
-
-						if count_close > 1:
-							if count_eq > count_close:
-								lines.append("  {{0:<{0:d}s}} x{{1:,d}} close values:".format(max_val_str_len).format(str(val), count_close))
-								for close_val in close_values:
-									visited.add(close_val)
-
-									count_eq = len([x for x in col if x == close_val])
-									if count_eq > 1:
-										lines.append("  {{0:<{0:d}s}} x{{1:,d}}".format(max_val_str_len).format(str(close_val), count_eq))
-									else:
-										lines.append("  {{0:<{0:d}s}}".format(max_val_str_len).format(str(close_val)))
-							else:
-								lines.append("  {{0:<{0:d}s}} x{{1:,d}}".format(max_val_str_len).format(str(val), count_eq))
-						else:
-							lines.append("  {{0:<{0:d}s}}".format(max_val_str_len).format(str(val)))
-				for count_close, val, lines in sorted(float_groups, reverse=True):
+				for val, count_eq in zip(unique, unique_counts.tolist()):
+					lines = []
+
+					float_groups.append((count_eq, val, lines))
+
+					if count_eq > 1:
+						lines.append("  {{0:<{0:d}s}} x{{1:,d}}".format(max_val_str_len).format(str(val), count_eq))
+					else:
+						lines.append("  {{0:<{0:d}s}}".format(max_val_str_len).format(str(val)))
+				for count_eq, val, lines in sorted(float_groups, reverse=True):
 					for line in lines:
 						logger.warning(line)
 		if num_warnings >= 1:
 			logger.warning("")
 
 	# Print MSE for each column.
-	nplabels = all_labels.numpy()
-	npinput  = all_input.numpy()
-
+	#
+	# (Reduce on the device and only copy the per-column results back.)
 	if not model.reverse:
-		nperrors = (npoutput - nplabels)**2
+		errors = all_output - all_labels
 	else:
-		nperrors = (npoutput - npinput)**2
+		errors = all_output - all_input
 
-	mse_npmeans = np.apply_along_axis(np.mean, axis=0, arr=nperrors)
+	mse_npmeans = (errors * errors).mean(dim=0).cpu().numpy()
 	rmse_npmeans = np.sqrt(mse_npmeans)
 	mse_mean = mse_npmeans.mean()
 	rmse_mean = rmse_npmeans.mean()
 
-	labels_npvar = np.apply_along_axis(np.var, axis=0, arr=nplabels)
-	labels_npstd = np.apply_along_axis(np.std, axis=0, arr=nplabels)
-	input_npvar = np.apply_along_axis(np.var, axis=0, arr=npinput)
-	input_npstd = np.apply_along_axis(np.std, axis=0, arr=npinput)
+	labels_var = all_labels.var(dim=0, unbiased=False)
+	input_var  = all_input.var(dim=0, unbiased=False)
+	labels_npvar = labels_var.cpu().numpy()
+	labels_npstd = labels_var.sqrt().cpu().numpy()
+	input_npvar = input_var.cpu().numpy()
+	input_npstd = input_var.sqrt().cpu().numpy()
+
+	float_fmt = "{0:f}".format
 
 	if not model.reverse:
 		logger.info("")
 		logger.info("Columns: <{0:s}>".format(", ".join(simulation_data.simulation_info.sim_input_names)))
 		logger.info("")
-		logger.info("Prediction MSEs for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in mse_npmeans)))
-		logger.info("Label variance for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in labels_npvar)))
+		logger.info("Prediction MSEs for each column: <{0:s}>".format(", ".join(map(float_fmt, mse_npmeans))))
+		logger.info("Label variance for each column: <{0:s}>".format(", ".join(map(float_fmt, labels_npvar))))
 		logger.info("")
-		logger.info("Prediction RMSEs for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in rmse_npmeans)))
-		logger.info("Label stddev for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in labels_npstd)))
+		logger.info("Prediction RMSEs for each column: <{0:s}>".format(", ".join(map(float_fmt, rmse_npmeans))))
+		logger.info("Label stddev for each column: <{0:s}>".format(", ".join(map(float_fmt, labels_npstd))))
 		logger.info("")
 		logger.info("Mean of column MSEs: {0:f}".format(mse_mean))
 		logger.info("Mean of label variances: {0:f}".format(labels_npvar.mean()))
@@ -1390,11 +1519,11 @@ def run(
 		logger.info("(Reversed model: columns are sim outs, not sim ins.)")
 		logger.info("Columns: <{0:s}>".format(", ".join(simulation_data.simulation_info.sim_output_names)))
 		logger.info("")
-		logger.info("Prediction MSEs for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in mse_npmeans)))
-		logger.info("Label variance for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in input_npvar)))
+		logger.info("Prediction MSEs for each column: <{0:s}>".format(", ".join(map(float_fmt, mse_npmeans))))
+		logger.info("Label variance for each column: <{0:s}>".format(", ".join(map(float_fmt, input_npvar))))
 		logger.info("")
-		logger.info("Prediction RMSEs for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in rmse_npmeans)))
-		logger.info("Label stddev for each column: <{0:s}>".format(", ".join("{0:f}".format(x) for x in input_npstd)))
+		logger.info("Prediction RMSEs for each column: <{0:s}>".format(", ".join(map(float_fmt, rmse_npmeans))))
+		logger.info("Label stddev for each column: <{0:s}>".format(", ".join(map(float_fmt, input_npstd))))
 		logger.info("")
 		logger.info("Mean of column MSEs: {0:f}".format(mse_mean))
 		logger.info("Mean of label variances: {0:f}".format(input_npvar.mean()))
@@ -1419,12 +1548,22 @@ def generate(save_data_path, logger=logger):
 	TODO: document and clean up.
 	"""
 	simulation_info=simulation.simulation_info
-	import random
-	with open(save_data_path, "w") as f:
-		f.write(
-			",".join(simulation_info.sim_input_names + simulation_info.sim_output_names) + "\n",
-		)
-		for i in range(10000):
-			f.write(
-				",".join("{0:f}".format(zero) for zero in simulation_info.num_sim_inputs * (0.0,)) + "," + ",".join("{0:f}".format(random.randrange(min, max)) for min, max in simulation_info.get_sim_output_ranges()) + "\n",
-			)
+	num_samples = 10000
+
+	# Generate all random outputs at once rather than row by row.
+	#
+	# Draw integers in [min, max), like random.randrange, but round the bounds
+	# up first: np.random.randint would truncate a non-integer min such as 0.1
+	# down to 0, below the minimum.  (Rounding up the exclusive max keeps
+	# every integer below it.)
+	sim_output_ranges = simulation_info.get_sim_output_ranges()
+	output_mins = np.ceil([min for min, max in sim_output_ranges]).astype(int)
+	output_maxs = np.ceil([max for min, max in sim_output_ranges]).astype(int)
+	npoutputs = np.random.randint(output_mins, output_maxs, size=(num_samples, len(sim_output_ranges)))
+	npinputs = np.zeros((num_samples, simulation_info.num_sim_inputs))
+
+	generated = pd.DataFrame(
+		data=np.concatenate((npinputs, npoutputs), axis=1),
+		columns=simulation_info.sim_input_names + simulation_info.sim_output_names,
+	)
+	generated.to_csv(save_data_path, index=False, float_format="%f")
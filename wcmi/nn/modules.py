@@ -217,6 +217,18 @@ class WCMIModule(nn.Module):
 		"""
 		raise NotImplementedError
 
+	def compile_layers(self):
+		"""
+		Compile the layers with torch.compile, in place, so that the state dict
+		is unchanged.  Do nothing if this version of pytorch doesn't support
+		it.
+
+		By default, `self.net` is compiled.  Subclasses with other layers
+		should override this method.
+		"""
+		if hasattr(self.net, "compile"):
+			self.net.compile()
+
 	def initialize_parameters(self):
 		"""
 		Initialize the parameters.  Generally this is used when there is no
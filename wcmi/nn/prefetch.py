@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# vim: set noet ft=python :
+
+"""
+Module providing a batch prefetcher to overlap copying batches to the device
+with computation on the previous batch.
+"""
+
+import torch
+
+import wcmi.nn.data as data
+
+class BatchPrefetcher():
+	"""
+	Iterate over batches, each a tuple of tensors, moving each batch to
+	`device`.
+
+	On CUDA, the copy of the next batch is issued on a separate stream while
+	the current batch is being used, so that host-to-device copies overlap
+	with the forward and backward passes.  (The copies are only asynchronous
+	for pinned host tensors.)  On other devices, or for batches whose tensors
+	are all already on the device, each batch is simply passed through without
+	involving the side stream.
+
+	Example:
+		batches = zip(training_input.split(batch_size), training_labels.split(batch_size))
+		for batch_input, batch_labels in BatchPrefetcher(batches, device=data.device):
+			...
+	"""
+
+	def __init__(self, batches, device=None):
+		"""
+		Start copying the first batch to the device.
+		"""
+		# Default arguments.
+		if device is None:
+			device = data.device
+
+		self.batches = iter(batches)
+		self.device = device
+		# The side stream, created the first time a batch needs copying.
+		self.stream = None
+
+		self.next_batch = None
+		self.next_batch_copied = False
+		self.preload()
+
+	def is_on_device(self, tensor):
+		"""
+		Is the tensor already on the device?  (A device without an index, e.g.
+		`cuda`, matches any index of its type.)
+		"""
+		return tensor.device.type == self.device.type and (self.device.index is None or tensor.device.index == self.device.index)
+
+	def preload(self):
+		"""
+		Begin moving the next batch to the device, or set next_batch to None
+		if there are no more batches.
+		"""
+		try:
+			batch = next(self.batches)
+		except StopIteration:
+			self.next_batch = None
+			self.next_batch_copied = False
+			return
+
+		# Only use the side stream if there is something to copy.
+		self.next_batch_copied = self.device.type == 'cuda' and not all(self.is_on_device(tensor) for tensor in batch)
+
+		if not self.next_batch_copied:
+			self.next_batch = (*(tensor.to(self.device) for tensor in batch),)
+		else:
+			if self.stream is None:
+				self.stream = torch.cuda.Stream(device=self.device)
+			with torch.cuda.stream(self.stream):
+				self.next_batch = (*(tensor.to(self.device, non_blocking=True) for tensor in batch),)
+
+	def __iter__(self):
+		return self
+
+	def __next__(self):
+		"""
+		Wait for the next batch's copy to finish, start copying the batch
+		after it, and return it.
+		"""
+		batch = self.next_batch
+		if batch is None:
+			raise StopIteration
+
+		if self.next_batch_copied:
+			# Make the current stream wait for the copy, and don't let the
+			# caching allocator reuse the batch's memory while the current
+			# stream may still be using it.
+			current_stream = torch.cuda.current_stream(self.device)
+			current_stream.wait_stream(self.stream)
+			for tensor in batch:
+				tensor.record_stream(current_stream)
+
+		self.preload()
+		return batch